@@ -26,7 +26,8 @@
 #
 
 
-import sys, os, re, traceback, timeit
+import sys, os, re, traceback, timeit, subprocess, pickle, hashlib, atexit, mmap
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 def usage():
     print( "USAGE: " + sys.argv[0] + " {iterations}" )
@@ -34,19 +35,18 @@ def usage():
 
 
 # Simple progress bar.
+_BAR_FULL  = "■"
+_BAR_EMPTY = " "
+
 def __progress_bar( files, total_files ):
     if total_files == 0:
         return
-    print( "\r\tParsing [", end="" )
-    hashes = ""
     max_hashes = 40
     hashes_count = int( (files/total_files) * max_hashes )
-    for x in range(hashes_count):
-        hashes += "■"
-    for x in range(max_hashes-hashes_count):
-        hashes += " "
-    color_print( hashes, BLUE, is_newline=False )
-    print( "] (" + str(files) + "/" + str(total_files) + ")", end="" )
+    hashes = _BAR_FULL * hashes_count + _BAR_EMPTY * (max_hashes - hashes_count)
+    sys.stdout.write( "\r\tParsing [" + BLUE + hashes + RESET
+        + "] (" + str(files) + "/" + str(total_files) + ")" )
+    sys.stdout.flush()
 
 
 # Terminal colors for our delight (thank you, StackOverflow).
@@ -61,108 +61,163 @@ RESET  = "\033[0;0m"
 BOLD   = "\033[;1m"
 
 def color_print( msg, color = WHITE, is_bold = False, is_newline = True ):
-    if is_bold is True:
-        print( BOLD, end="" )
-
-    if is_newline is True:
-        print( color + msg + RESET )
-    else:
-        print( color + msg + RESET, end="" )
+    sys.stdout.write( (BOLD if is_bold is True else "") + color + msg + RESET
+        + ("\n" if is_newline is True else "") )
 
 
-# Remove all .gen files created by the fuzzer.
-def clean_gen_files():
-    for file in os.listdir( myfullpath + "/compliance/" ):
-        if file.endswith( ".gen" ):
-            os.remove( myfullpath+"/compliance/"+file )
-
-
-
-# Nanofuzz input pattern to regex string conversion.
+# Remove all .gen files created by the fuzzer in the given directory. A list of
+#   previously-scanned entries can be passed to skip scanning the directory again.
+def clean_gen_files( path, entries = None ):
+    if entries is None:
+        entries = [ e for e in os.scandir( path ) if e.name.endswith( ".gen" ) ]
+    for entry in entries:
+        try:
+            os.unlink( entry.path )
+        except FileNotFoundError:
+            pass   #moved to the errors folder
+
+
+
+# Precompiled expressions used while translating patterns into regexes.
+_RE_ESCAPE_META   = re.compile( rb'([^<\[\\])([+\^\$\.])' )
+_RE_LEADING_META  = re.compile( rb'^([+\^\$\.])' )
+_RE_OPEN_REPEAT   = re.compile( rb'([^\\]){,' )
+_RE_CLOSE_REPEAT  = re.compile( rb',}' )
+_RE_STAR          = re.compile( rb'\*' )
+_RE_DEC_HEX       = re.compile( rb'\[([^\]]*?)\\d([0-9]+)([^\]]*?)\]' )
+_RE_COMMA_STRIP   = re.compile( rb'\[([^\]]*?)([^\\]),([^\]]*?)\]' )
+_RE_VAR_SHUFFLE   = re.compile( rb'<%[A-Za-z0-9]+>' )
+_RE_VAR_TYPE      = re.compile( rb'<#([dxobrgl])([0-9])?.*?:[0-9A-Z]+?>' )
+_RE_TXT_SUFFIX    = re.compile( r'(?i)\.txt$' )
+_RE_HEX_BYTE      = re.compile( rb'[0-9A-Fa-f]{2}' )
+
+# Whitespace bytes deleted from input patterns.
+_WS_BYTES = b'\t\n\x0b\x0c\r '
+
+
+# Remove variable declarations like '(abc)<$VAR>' from a regex and replace each
+#   '<@VAR>' reference with the declared subsequence. This is done in a single scan: the
+#   output is built as a list of byte strings and reference markers, declarations are cut
+#   out of it as they close, and references are only resolved at the end so they may
+#   appear before or inside the declarations they refer to.
+def expand_variables( _regex ):
+    out = []
+    stack = []   #indices in 'out' of each unclosed '('
+    decls = {}
+    i = 0
+    while i < len(_regex):
+        c = _regex[i:i+1]
+        if c == b'\\':
+            out.append( _regex[i:i+2] )
+            i += 2
+            continue
+        elif c == b'<' and _regex.startswith( b"<@", i ):
+            end = _regex.find( b'>', i+2 )
+            if end >= 0:
+                out.append( ( _regex[i+2:end], ) )
+                i = end + 1
+                continue
+        elif c == b'(':
+            stack.append( len(out) )
+        elif c == b')' and len(stack) > 0:
+            start = stack.pop()
+            end = _regex.find( b'>', i+3 ) if _regex.startswith( b"<$", i+1 ) else -1
+            if end >= 0:
+                # Cut the whole subsequence out of the output and register it.
+                out.append( c )
+                decls.setdefault( _regex[i+3:end], out[start:] )
+                del out[start:]
+                i = end + 1
+                continue
+        out.append( c )
+        i += 1
+
+    expanded = {}
+    def expand( pieces, seen ):
+        text = []
+        for x in pieces:
+            if not isinstance( x, tuple ):
+                text.append( x )
+                continue
+            varname = x[0]
+            if varname not in decls or varname in seen:
+                text.append( b"<@" + varname + b">" )   #undeclared or self-referencing
+            else:
+                if varname not in expanded:
+                    expanded[varname] = expand( decls[varname], seen | {varname} )
+                text.append( expanded[varname] )
+        return b''.join( text )
+
+    return expand( out, frozenset() )
+
+
+# Nanofuzz input pattern to regex conversion.
+#   Both the input pattern and the resulting regex are bytes, since patterns may hold
+#   binary data. Returns a tuple of the regex and its compiled pattern.
 def pattern_to_regex( pattern ):
     _regex = pattern
 
     # Fix special chars that aren't always escaped in nanofuzz inputs.
-    _regex = re.sub( r'([^<\[\\])([+\^\$\.])', r'\1\\\2', _regex )
-    _regex = re.sub( r'^([+\^\$\.])', r'\\\1', _regex )
+    _regex = _RE_ESCAPE_META.sub( rb'\1\\\2', _regex )
+    _regex = _RE_LEADING_META.sub( rb'\\\1', _regex )
 
 
     # Fix repetitions and make them more explicit.
-    _regex = re.sub( r'([^\\]){,', r'\1{0,', _regex )
-    _regex = re.sub( r',}', ',65535}', _regex )
+    _regex = _RE_OPEN_REPEAT.sub( rb'\1{0,', _regex )
+    _regex = _RE_CLOSE_REPEAT.sub( b',65535}', _regex )
 
 
     # Fix other repetition or range shortcut aliases.
-    _regex = re.sub( r'\*', '[\\x00-\\xFF]', _regex )
+    _regex = _RE_STAR.sub( rb'[\\x00-\\xFF]', _regex )
 
 
     # Fix ranges. Get rid of unescaped commas and convert decimal escapes to hex.
     def dec_to_hex( matchobj ):
         try:
             x = int( matchobj.group(2) )
-            return '[' + matchobj.group(1) + '\\x' + str( hex(x) ).split('x')[-1] + matchobj.group(3) + ']'
+            return b'[' + matchobj.group(1) + b'\\x' + b'%x' % x + matchobj.group(3) + b']'
         except:
-            return '[' + matchobj.group(1) + matchobj.group(2) + matchobj.group(3) + ']'
+            return b'[' + matchobj.group(1) + matchobj.group(2) + matchobj.group(3) + b']'
 
-    for x in range( 64 ):
-        _regex = re.sub( r'\[([^\]]*?)\\d([0-9]+)([^\]]*?)\]', dec_to_hex, _regex )
+    #   Each pass only handles one escape per range, so repeat until nothing changes.
+    while True:
+        _regex, n = _RE_DEC_HEX.subn( dec_to_hex, _regex )
+        if n == 0:
+            break
 
-    #   Next, remove commas from ranges. This is hacky but it works OK since
-    #   ranges are limited by nanofuzz to being something like 16 or 32 items in number.
-    for x in range( 32 ):
-        _regex = re.sub( r'\[([^\]]*?)([^\\]),([^\]]*?)\]', r'[\1\2\3]', _regex )
+    #   Next, remove commas from ranges. Like above, one comma per range is removed
+    #   on each pass, so keep going until no more unescaped commas are found.
+    while True:
+        _regex, n = _RE_COMMA_STRIP.subn( rb'[\1\2\3]', _regex )
+        if n == 0:
+            break
 
 
     # Scrub variables and expand where included.
     #   Remove shuffle operators for vars, but be careful not to destroy any existing branches.
     #   Ex: 'a|b|<%VAR>|c|d' --> 'a|b|(.{0})|c|d'   /// 'a|b|c|d|<%VAR>' --> 'a|b|c|d|(.{0})'
-    _regex = re.sub( r'<%[A-Za-z0-9]+>', '(.{0})', _regex )
-
-    # Replace variable length types with a simple regex.
-    _regex = re.sub( r'<#d.*?:[0-9A-Z]+?>', '([0-9]+?)', _regex )
-    _regex = re.sub( r'<#x.*?:[0-9A-Z]+?>', '([0-9A-Fa-f]+?)', _regex )
-    _regex = re.sub( r'<#o.*?:[0-9A-Z]+?>', '([0-7]+?)', _regex )
-    _regex = re.sub( r'<#b.*?:[0-9A-Z]+?>', '([01]+?)', _regex )
-    _regex = re.sub( r'<#[rgl]([0-9]).*?:[0-9A-Z]+?>', r'([\x00-\xFF]{1,\1}?)', _regex )
+    _regex = _RE_VAR_SHUFFLE.sub( b'(.{0})', _regex )
+
+    # Replace variable length types with a simple regex, all in one pass.
+    def var_type( matchobj ):
+        kind = matchobj.group(1)
+        if kind == b'd':
+            return b'([0-9]+?)'
+        elif kind == b'x':
+            return b'([0-9A-Fa-f]+?)'
+        elif kind == b'o':
+            return b'([0-7]+?)'
+        elif kind == b'b':
+            return b'([01]+?)'
+        elif matchobj.group(2) is not None:
+            return rb'([\x00-\xFF]{1,%b}?)' % matchobj.group(2)
+        else:
+            return matchobj.group(0)   #raw types need a length
+
+    _regex = _RE_VAR_TYPE.sub( var_type, _regex )
 
     # Find variable declarations and expand their occurrences.
-    try:
-        while True:   #keep going until no more ")<$" instances (declarations)
-            loc = _regex.index( ")<$" )
-            # Scan backward until the right '(' is found.
-            rev = _regex[(loc-1)::-1]
-            rev = re.sub( r'[()]\\', "__", rev )
-            nest = 1
-            start_paren = 0
-            for x in rev:
-                if x == ')':
-                    nest += 1
-                elif x == '(':
-                    nest -= 1
-
-                if nest == 0:
-                    break
-                else:
-                    start_paren += 1
-
-            statement = _regex[(loc-1-start_paren):(loc+1)]
-            #print("VAR IS: |"+statement+"|")
-
-            varname = ""
-            for x in _regex[(loc+1):(loc+12)]:
-                if x == '>':
-                    break
-                elif x == '<' or x == '$':
-                    continue
-                varname += x
-
-            #print( "--- NAME is |"+varname+"|")
-            # Replace occurrences in the original string.
-            _regex = _regex.replace( (statement + "<$" + varname + ">"), "" )
-            #print( "\t\tReplacing '{}' vars with '({})'".format( varname, statement ) )
-            _regex = _regex.replace( ("<@" + varname + ">"), statement )
-    except:
-        pass   #exit loop
+    _regex = expand_variables( _regex )
 
     # Fix branches which are not wrapped in parens. This is pretty sloppy and broken honestly.
     #   Ex: a|b|(cde)|g|(hij) --> (a|b|(cde)|g|(hij)) TODO
@@ -191,156 +246,358 @@ def pattern_to_regex( pattern ):
     #_regex = re.sub( r'\|(\\?[^\\\(\|])([^\|])', r'|\1)\2', _regex )
     #_regex = re.sub( r'([^\|])(\\?[^\)\|])\|', r'\1(\2|', _regex )
 
-    # Finally, test the regex 'compile' function on this. If the regex
-    #   is not valid, this will throw an exception.
-    #print( "\tCompiling: |" + _regex + "|" )
-    re.compile( _regex )
-    return _regex
-
-
-
-color_print( "========== NANOFUZZ COMPLIANCE TESTING ==========", is_bold=True )
-
-# Get CLI options and arguments.
-if len(sys.argv) < 2:
-    usage()
+    # Finally, compile the binary regex used to match the generated output. If the
+    #   regex is not valid, this will throw an exception.
+    #print( "\tCompiling: |" + _regex.decode( errors='replace' ) + "|" )
+    compiled = re.compile( _regex, flags = re.MULTILINE )
+    return ( _regex, compiled )
+
+
+
+# Find the literal bytes every match of a translated regex must start and end with.
+#   These are used as a cheap prefilter to reject gen files before running the regex.
+#   Returns a tuple of (prefix, suffix); either may be empty when nothing is certain.
+def regex_literal_affixes( regex ):
+    escapes = { b'n': b'\n', b'r': b'\r', b't': b'\t', b'f': b'\f', b'v': b'\v', b'a': b'\a' }
+    quantifiers = b"{?*+"
+    # Inline flags can change how literals match, so don't guess at those.
+    if b"(?" in regex:
+        return ( b'', b'' )
+
+    # Find the index of the ']' closing the range opened at index 'i', or -1. A ']' right
+    #   after the opening '[' or '[^' is a member of the range rather than its end.
+    def skip_range( i ):
+        i += 1
+        if regex[i:i+1] == b'^':
+            i += 1
+        if regex[i:i+1] == b']':
+            i += 1
+        while i < len(regex):
+            if regex[i:i+1] == b'\\':
+                i += 1
+            elif regex[i:i+1] == b']':
+                return i
+            i += 1
+        return -1
+
+    # Split the top level of the regex into literal bytes and
+    #   anything else (as None). Quantified literals don't count as literals.
+    tokens = []
+    i = 0
+    while i < len(regex):
+        c = regex[i:i+1]
+        if c == b'|':
+            return ( b'', b'' )   #top-level branch, nothing is certain
+        elif c == b'\\' and i+1 < len(regex):
+            x = regex[i+1:i+2]
+            if x in escapes:
+                tokens.append( escapes[x] )
+                i += 2
+            elif x == b'x' and _RE_HEX_BYTE.fullmatch( regex, i+2, i+4 ):
+                tokens.append( bytes( [ int( regex[i+2:i+4], 16 ) ] ) )
+                i += 4
+            elif not x.isalnum():
+                tokens.append( x )
+                i += 2
+            else:
+                tokens.append( None )
+                i += 2
+        elif c == b'(' or c == b'[':
+            # Skip over the whole subsequence or range. Parens inside a range don't nest.
+            nest = 0
+            while i < len(regex):
+                if regex[i:i+1] == b'\\':
+                    i += 1
+                elif regex[i:i+1] == b'[':
+                    i = skip_range( i )
+                    if i < 0:
+                        return ( b'', b'' )   #unterminated range
+                    if c == b'[':
+                        break
+                elif regex[i:i+1] == b'(':
+                    nest += 1
+                elif regex[i:i+1] == b')':
+                    nest -= 1
+                    if nest == 0:
+                        break
+                i += 1
+            tokens.append( None )
+            i += 1
+        elif c in quantifiers:
+            if len(tokens) > 0:
+                tokens[-1] = None
+            if c == b'{':
+                i = regex.find( b'}', i )
+                if i < 0:
+                    return ( b'', b'' )
+            i += 1
+            if regex[i:i+1] == b'?':
+                i += 1   #lazy quantifier
+            tokens.append( None )
+        elif c in b".^$":
+            tokens.append( None )
+            i += 1
+        else:
+            tokens.append( c )
+            i += 1
+
+    prefix = b''
+    for x in tokens:
+        if x is None:
+            break
+        prefix += x
+    suffix = b''
+    for x in reversed(tokens):
+        if x is None:
+            break
+        suffix = x + suffix
+    return ( prefix, suffix )
+
+
+# Load the translated regexes saved by previous runs. The cache is discarded whenever
+#   this script changes, since the translation itself may have changed with it.
+def load_regex_cache():
+    try:
+        with open( _CACHE_PATH, 'rb' ) as hfile:
+            digest, cache = pickle.load( hfile )
+        if digest == _SCRIPT_DIGEST:
+            return cache
+    except:
+        pass
+    return {}
 
-iters = 0
-try:
-    iters = int( sys.argv[1] )
-except:
-    usage()
 
-print( " `----> ", end="" )
-color_print( str(iters), color=CYAN, is_bold=True, is_newline=False )
-print( " iterations for each pattern." )
+# Atomically write the regex cache back to disk.
+def save_regex_cache( cache ):
+    tmp_path = _CACHE_PATH + "." + str(os.getpid())
+    try:
+        with open( tmp_path, 'wb' ) as hfile:
+            pickle.dump( (_SCRIPT_DIGEST, cache), hfile )
+        os.replace( tmp_path, _CACHE_PATH )
+    except:
+        try:
+            os.remove( tmp_path )
+        except:
+            pass
 
 
-# Preliminary setup.
-myfullpath = os.path.dirname( os.path.realpath(__file__) )
-whitespaces = ['\x09', '\x0A', '\x0B', '\x0C', '\x0D', '\x20']
-tested_file_count = 0
-failed = 0
-succeeded = 0
 
-for file in os.listdir( myfullpath + "/compliance/" ):
-    # Setup.
-    clean_gen_files()
+# Test a single pattern file against the fuzzer's output for it. Since this runs in a
+#   worker process, all output is collected into a list of color_print arguments which
+#   the caller replays once the pattern is finished. Regexes found in the given cache
+#   are reused; newly-translated ones are handed back for the caller to store.
+#   Returns a tuple of (succeeded, failed, name, report, cache_entry).
+def process_pattern( file, iters, cache ):
+    report = []
+    cache_entry = None
+    def log( msg, color = RESET, is_bold = False, is_newline = True ):
+        report.append( (msg, color, is_bold, is_newline) )
 
-    # Only process .txt files.
-    if not file.endswith( ".txt" ):
-        continue
-    else:
-        print( "\nPattern file: " + file )
-        tested_file_count += 1
+    log( "\nPattern file: " + file )
 
-    # Read the file's content as a string.
+    # Read the file's content as raw bytes.
     content = None
-    with open( myfullpath+"/compliance/"+file ) as hfile:
+    with open( file, mode='rb' ) as hfile:
         content = hfile.read()
 
-    # Replace any possible whitespace characters in the input.
-    for x in whitespaces:
-        content = content.replace( x, "" ) if content is not None else None
+    # Remove any possible whitespace characters from the input in a single pass.
+    content = content.translate( None, _WS_BYTES ) if content is not None else None
 
     # If the content couldn't be read, exit. Otherwise, strip out all whitespace.
     if content is None or len(content.strip()) < 1:
-        print( "~~~~~ Failed to read file content." )
-        failed += 1
-        continue
+        log( "~~~~~ Failed to read file content." )
+        return ( 0, 1, file, report, cache_entry )
     else:
-        print( "Content: ", end="" )
-        color_print( content, PURPLE )
+        log( "Content: ", is_newline=False )
+        log( content.decode( errors='replace' ), PURPLE )
 
     # Translate the content into a corresponding regex to use for validating the generation.
-    regex = ""
+    regex = b''
     regex_obj = None
     try:
-        regex = pattern_to_regex( content )
-        regex_obj = re.compile(  bytes( regex, encoding = 'utf8' ), flags = re.MULTILINE  )
+        key = hashlib.blake2b( content, digest_size=16 ).digest()
+        regex = cache.get( key )
+        if regex is None:
+            regex, regex_obj = pattern_to_regex( content )
+        else:
+            regex_obj = re.compile( regex, flags = re.MULTILINE )
         if regex_obj is None or regex is None or len(regex) < 1:
             raise Exception( "invalid expression" )
+        if key not in cache:
+            cache_entry = ( key, regex )
     except:
-        color_print( "Failed to transform the content string into a "
+        log( "Failed to transform the content string into a "
             + "parseable regular expression.", RED, is_bold=True )
         #traceback.print_exc()
-        failed += 1
-        continue
+        return ( 0, 1, file, report, cache_entry )
 
-    print( "Regex  : ", end="" )
-    color_print( regex, PURPLE )
+    log( "Regex  : ", is_newline=False )
+    log( regex.decode( errors='replace' ), PURPLE )
+    prefix, suffix = regex_literal_affixes( regex )
 
 
-    # Begin tester iterations and attempt to time them.
-    print( "\tGenerating...    ", end="" )
-    sys.stdout.flush()
+    # Each worker gets its own output directory so gen names never collide.
+    workdir = os.path.join( "_work", str(os.getpid()) + "_" + file, "" )
+    os.makedirs( workdir, exist_ok=True )
+    clean_gen_files( workdir )
+    gen_entries = None
 
-    call_ec = 255
-    fuzzer_call = ( myfullpath + "/../bin/nanofuzz -f " + myfullpath+"/compliance/"+file
-        + " -l " + str(iters) + " -o " + myfullpath+"/compliance/"
-        + re.sub(r'(?i)\.txt$', '', file) + "*.gen >&/dev/null" )
+    try:
+        # Begin tester iterations and attempt to time them.
+        log( "\tGenerating...    ", is_newline=False )
 
-    gen_time = timeit.timeit( lambda: os.system(fuzzer_call), number=1 )
+        call_ec = 255
+        fuzzer_call = [ NANOFUZZ_BIN, "-f", file,
+            "-l", str(iters), "-o", workdir + _RE_TXT_SUFFIX.sub('', file) + "*.gen" ]
 
-    call_ec >>= 8
-    if call_ec != 0:
-        color_print( "\rFailed to call nanofuzz for the input pattern.", RED, is_bold=True )
-        failed += 1
-        continue
-    else:
-        print( "Finished content generation in ", end="" )
-        color_print( str(round(gen_time,3))+" seconds", WHITE, is_bold=True, is_newline=False )
-        print( ".", end="" )
-
-
-    # Compare the binary regex_obj against the binary gen-file contents.
-    #   TODO: This is quite inefficient (probably don't care); total_files should == iters
-    total_files = 0
-    for genfile in os.listdir( myfullpath+'/compliance/' ):
-        if genfile.endswith( ".gen" ):
-            total_files += 1
-    if total_files != iters:
-        color_print( "\rFailed to call nanofuzz for the input pattern.               ",
-            RED, is_bold=True )
-        failed += 1
-        continue
-    else:
-        print( "\n", end="" )
-
-    files = 0
-    reg_fail = 0
-    for genfile in os.listdir( myfullpath+'/compliance/' ):
-        if genfile.endswith( ".gen" ):
-            with open( myfullpath+'/compliance/'+genfile, mode='rb' ) as genhnd:
-                files += 1
-                __progress_bar( files, total_files )
-                file_content = genhnd.read()
-                if re.fullmatch( regex_obj, file_content ) is None:
-                    try:
-                        os.rename( myfullpath+'/compliance/'+genfile, myfullpath+'/compliance/errors/'+genfile )
-                    except:
-                        pass
-                    reg_fail += 1
-
-    # Simple tracking.
-    if reg_fail == 0:
-        color_print( "\n\tSuccess for "+str(files)+" of "+str(files)+" files.", GREEN )
-        succeeded += 1
-    else:
-        color_print( "\n\tFailed regex tests for "+str(reg_fail)+" of "+str(files)+" files.", RED )
-        failed += 1
+        gen_start = timeit.default_timer()
+        try:
+            call_ec = subprocess.run( fuzzer_call, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL, check=False ).returncode
+        except OSError:
+            pass   #binary is missing or not executable
+        gen_time = timeit.default_timer() - gen_start
+
+        if call_ec != 0:
+            log( "Failed to call nanofuzz for the input pattern.", RED, is_bold=True )
+            return ( 0, 1, file, report, cache_entry )
+        else:
+            log( "Finished content generation in ", is_newline=False )
+            log( str(round(gen_time,3))+" seconds", WHITE, is_bold=True, is_newline=False )
+            log( "." )
+
+
+        # Compare the binary regex_obj against the binary gen-file contents.
+        #   The directory is scanned once and reused for counting, matching, and clean-up.
+        gen_entries = [ e for e in os.scandir( workdir ) if e.name.endswith( ".gen" ) ]
+        total_files = len(gen_entries)
+        if total_files != iters:
+            log( "\tFailed to call nanofuzz for the input pattern.", RED, is_bold=True )
+            return ( 0, 1, file, report, cache_entry )
+
+        def is_match( buf ):
+            # Only run the full regex when the literal prefix and suffix are present.
+            if len(buf) < max( len(prefix), len(suffix) ):
+                return False
+            if buf[:len(prefix)] != prefix or buf[len(buf)-len(suffix):] != suffix:
+                return False
+            return regex_obj.fullmatch( buf ) is not None
+
+        # Small gen files are simply read; files spanning at least a page are mapped
+        #   instead so they are matched without copying them into memory.
+        files = 0
+        reg_fail = 0
+        for entry in gen_entries:
+            files += 1
+            with open( entry.path, mode='rb' ) as genhnd:
+                if entry.stat().st_size < mmap.PAGESIZE:
+                    matched = is_match( genhnd.read() )
+                else:
+                    with mmap.mmap( genhnd.fileno(), 0, access=mmap.ACCESS_READ ) as mm:
+                        matched = is_match( mm )
+
+            if not matched:
+                try:
+                    os.rename( entry.path, os.path.join( "errors", entry.name ) )
+                except:
+                    pass
+                reg_fail += 1
+
+        # Simple tracking.
+        if reg_fail == 0:
+            log( "\tSuccess for "+str(files)+" of "+str(files)+" files.", GREEN )
+            return ( 1, 0, file, report, cache_entry )
+        else:
+            log( "\tFailed regex tests for "+str(reg_fail)+" of "+str(files)+" files.", RED )
+            return ( 0, 1, file, report, cache_entry )
+
+    finally:
+        # Worker clean-up.
+        clean_gen_files( workdir, gen_entries )
+        os.rmdir( workdir )
 
 
-# Post-test clean-up.
-clean_gen_files()
+
+# Preliminary setup.
+myfullpath = os.path.dirname( os.path.realpath(__file__) )
+COMPLIANCE_DIR = os.path.join( myfullpath, "compliance" )
+NANOFUZZ_BIN = os.path.join( myfullpath, "..", "bin", "nanofuzz" )
+_CACHE_PATH = myfullpath + "/.compliance_cache.pkl"
+with open( os.path.realpath(__file__), 'rb' ) as hfile:
+    _SCRIPT_DIGEST = hashlib.blake2b( hfile.read(), digest_size=16 ).digest()
+
+
+if __name__ == "__main__":
+    color_print( "========== NANOFUZZ COMPLIANCE TESTING ==========", is_bold=True )
+
+    # Get CLI options and arguments.
+    if len(sys.argv) < 2:
+        usage()
+
+    iters = 0
+    try:
+        iters = int( sys.argv[1] )
+    except:
+        usage()
+
+    print( " `----> ", end="" )
+    color_print( str(iters), color=CYAN, is_bold=True, is_newline=False )
+    print( " iterations for each pattern." )
+
+    # All pattern, gen, and error files are used relative to the compliance folder, and
+    #   workers inherit this working directory.
+    os.chdir( COMPLIANCE_DIR )
+
+    # Only process .txt files.
+    pattern_files = [ entry.name for entry in os.scandir( "." )
+        if entry.name.endswith( ".txt" ) and entry.is_file() ]
+    tested_file_count = len(pattern_files)
+    failed = 0
+    succeeded = 0
+
+    # Reuse regexes translated by previous runs, and save any new ones on exit.
+    regex_cache = load_regex_cache()
+    atexit.register( save_regex_cache, regex_cache )
+
+    # Test each pattern in its own process and report them as they complete.
+    with ProcessPoolExecutor( max_workers = os.cpu_count() ) as executor:
+        futures = { executor.submit( process_pattern, file, iters, regex_cache ): file for file in pattern_files }
+        done = 0
+        for future in as_completed( futures ):
+            done += 1
+            try:
+                _succeeded, _failed, name, report, cache_entry = future.result()
+            except:
+                color_print( "\nPattern file " + futures[future] + " raised an exception.",
+                    RED, is_bold=True )
+                traceback.print_exc()
+                failed += 1
+                continue
+
+            for args in report:
+                color_print( *args )
+            succeeded += _succeeded
+            failed += _failed
+            if cache_entry is not None:
+                regex_cache[cache_entry[0]] = cache_entry[1]
+
+            __progress_bar( done, tested_file_count )
+            print( "" )
+
+
+    # Post-test clean-up.
+    try:
+        os.rmdir( "_work" )
+    except:
+        pass
 
 
 
-# Print a summary of the tests. TODO: Clean up.
-color_print( "\n\n\tTested ", is_bold=True, is_newline=False )
-color_print( str(tested_file_count), YELLOW, is_bold=True, is_newline=False )
-color_print( " Files; ", is_bold=True, is_newline=False )
-color_print( str(succeeded), GREEN, is_bold=True, is_newline=False )
-color_print( " Successes; ", is_bold=True, is_newline=False )
-color_print( str(failed), RED, is_bold=True, is_newline=False )
-color_print( " Failures\n\n", is_bold=True, is_newline=False )
+    # Print a summary of the tests. TODO: Clean up.
+    color_print( "\n\n\tTested ", is_bold=True, is_newline=False )
+    color_print( str(tested_file_count), YELLOW, is_bold=True, is_newline=False )
+    color_print( " Files; ", is_bold=True, is_newline=False )
+    color_print( str(succeeded), GREEN, is_bold=True, is_newline=False )
+    color_print( " Successes; ", is_bold=True, is_newline=False )
+    color_print( str(failed), RED, is_bold=True, is_newline=False )
+    color_print( " Failures\n\n", is_bold=True, is_newline=False )
@@ -5,7 +5,12 @@
 #
 
 
-import os, sys, re, subprocess
+import os, sys, re, subprocess, operator
+
+
+# Precompiled expressions for parsing the (ASCII) objdump symbol table.
+_SPLIT = re.compile( rb' +' )
+_HEX   = re.compile( rb'^0+|[^0-9a-f]*$' )
 
 
 myfullpath = os.path.dirname( os.path.realpath(__file__) )
@@ -24,26 +29,27 @@ getsym = [ "objdump", "-t", myfullpath+"/../bin/nanofuzz" ]
 sym = subprocess.Popen( getsym, stdout=subprocess.PIPE )
 
 symbols = {}
-for line in sym.stdout.readlines():
-    x = [ p.strip() for p in re.split( " +", line.decode("utf-8") ) ]
+for line in sym.stdout:
+    x = [ p.strip() for p in _SPLIT.split( line.strip() ) ]
     if len(x) < 2 or len(x[-1]) < 1 or len(x[0]) < 1:
         continue
 
-    _offset = re.sub( '^0+|[^0-9a-f]*$', '', str(x[0]) )
+    _offset = _HEX.sub( b'', x[0] )
     if len(_offset) < 1:
         continue
 
-    offset = "0x" + _offset
-    func = x[-1]
+    offset = "0x" + _offset.decode("ascii")
+    func = x[-1].decode("utf-8")
 
-    _obj = {"name":func}
-    symbols[offset] = _obj
+    symbols[offset] = func
 
 
 execall = [ myfullpath+"/../bin/nanofuzz", "-l", str(count), "-f", myfullpath+"/compliance/simple_mixed1.txt" ]
 print( "\tExecuting nanofuzz" )
 proc = subprocess.Popen( execall, stdout=subprocess.PIPE )
 
+# Executed symbols as (name, time, calls) tuples, keyed by their address.
+timed = {}
 for line in proc.stdout.readlines():
     x = [ p.strip().replace('|', '') for p in line.decode("utf-8").split("-->") ]
     if len(x) < 3:
@@ -54,37 +60,27 @@ for line in proc.stdout.readlines():
     amnt = x[2]
 
     if addr in symbols.keys():
-        symbols[addr]["time"] = time
-        symbols[addr]["amnt"] = amnt
+        try:
+            timed[addr] = ( symbols[addr], float( time.rstrip('s') ), int( amnt ) )
+        except ValueError:
+            print( "\t\tUnable to parse the timing information for '" + symbols[addr] + "'." )
     else:
         print( "\t\tMisunderstood function pointer; no equivalent symbol for '"
             + addr +"', called " + str(amnt) + " times." )
 
 
-# Remove symbols from the list that weren't executed in the profiling call.
+# Only symbols executed in the profiling call were timed; of those, drop the ones
+#   which didn't take a measurable amount of time.
 print( "\tCleaning unrelated symbols" )
-pops = []
-for x in symbols.keys():
-    if not "time" in symbols[x].keys():
-        pops.append(x)
-
-for x in pops:
-    symbols.pop(x)
+rows = [ v for v in timed.values() if v[1] >= 0.0001 ]
 
-# Sort the result.
-symbols_sorted = sorted( symbols.values(), key=lambda x: float(x["time"].replace('s','')) )
-symbols_sorted.reverse()
+# Sort the result by time, slowest first.
+rows.sort( key=operator.itemgetter(1), reverse=True )
 
 # Finally, print all timed information.
 print( "\n\n| {:<48} | {:<16} | {:<16} |".format('FUNCTION','TIME','CALLS') )
-for y in symbols_sorted:
-    #try:
-    #    if float( y["time"].replace('s','') ) < 0.0001:
-    #        continue
-    #except:
-    #    pass
-
-    print( "| {:<48} | {:<16} | {:<16} |".format( y["name"], y["time"], y["amnt"] ) )
+for name, time, amnt in rows:
+    print( "| {:<48} | {:<16} | {:<16} |".format( name, "{:.4f}s".format(time), amnt ) )
 
 
 print( "\n\n" )